@@ -1,16 +1,15 @@
 import os
 import re
 import shutil
-from wsgiref.util import FileWrapper
 
 import mimetypes
+from itertools import chain
+from functools import lru_cache
 
-from shutil import copyfileobj, move
 from django.core.exceptions import ObjectDoesNotExist, SuspiciousFileOperation, ValidationError
-from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.db import transaction
 from django.http import FileResponse
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from rest_framework import status, serializers, viewsets, filters, exceptions, permissions, parsers
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
@@ -24,15 +23,16 @@ from worker import tasks as worker_tasks
 from .common import get_and_check_project, get_asset_download_filename
 from .tags import TagsField
 from app.security import path_traversal_check
+from app.uploadhandler import copy_uploaded_file
 from django.utils.translation import gettext_lazy as _
 from webodm import settings
 
+# Characters not allowed in chunked upload identifiers
+unsafe_uuid_chars = re.compile('[^0-9a-zA-Z-]+')
+
 def flatten_files(request_files):
     # MultiValueDict in, flat array of files out
-    return [file for filesList in map(
-        lambda key: request_files.getlist(key),
-        [keys for keys in request_files])
-     for file in filesList]
+    return list(chain.from_iterable(files for _, files in request_files.lists()))
 
 class TaskIDsSerializer(serializers.BaseSerializer):
     def to_representation(self, obj):
@@ -68,9 +68,19 @@ class TaskSerializer(serializers.ModelSerializer):
         :return: array of valid rerun-from parameters
         """
         if obj.processing_node is not None:
+            # When serializing many tasks, the domain is computed once per processing node
+            cache = self.context.get('rerun_from_cache')
+            if cache is not None and obj.processing_node_id in cache:
+                return cache[obj.processing_node_id]
+
+            domain = []
             rerun_from_option = list(filter(lambda d: 'name' in d and d['name'] == 'rerun-from', obj.processing_node.available_options))
             if len(rerun_from_option) > 0 and 'domain' in rerun_from_option[0]:
-                return rerun_from_option[0]['domain']
+                domain = rerun_from_option[0]['domain']
+
+            if cache is not None:
+                cache[obj.processing_node_id] = domain
+            return domain
 
         return []
 
@@ -85,7 +95,7 @@ class TaskViewSet(viewsets.ViewSet):
     A task represents a set of images and other input to be sent to a processing node.
     Once a processing node completes processing, results are stored in the task.
     """
-    queryset = models.Task.objects.all().defer('orthophoto_extent', 'dsm_extent', 'dtm_extent', )
+    queryset = models.Task.objects.select_related('processing_node', 'project').defer('orthophoto_extent', 'dsm_extent', 'dtm_extent', )
     
     parser_classes = (parsers.MultiPartParser, parsers.JSONParser, parsers.FormParser, )
     ordering_fields = '__all__'
@@ -117,7 +127,10 @@ class TaskViewSet(viewsets.ViewSet):
         task.save()
 
         # Process task right away
-        worker_tasks.process_task.delay(task.id)
+        if pending_action in (pending_actions.CANCEL, pending_actions.REMOVE):
+            worker_tasks.process_task.apply_async((task.id, ), queue=settings.WORKER_CONTROL_QUEUE)
+        else:
+            worker_tasks.process_task.delay(task.id)
 
         return Response({'success': True})
 
@@ -147,13 +160,13 @@ class TaskViewSet(viewsets.ViewSet):
             raise exceptions.NotFound()
 
         line_num = max(0, int(request.query_params.get('line', 0)))
-        return Response('\n'.join(task.console.output().rstrip().split('\n')[line_num:]))
+        return Response(task.console.output_from_line(line_num))
 
     def list(self, request, project_pk=None):
         get_and_check_project(request, project_pk)
         tasks = self.queryset.filter(project=project_pk)
         tasks = filters.OrderingFilter().filter_queryset(self.request, tasks, self)
-        serializer = TaskSerializer(tasks, many=True)
+        serializer = TaskSerializer(tasks, many=True, context={'rerun_from_cache': {}})
         return Response(serializer.data)
 
     def retrieve(self, request, pk=None, project_pk=None):
@@ -180,7 +193,7 @@ class TaskViewSet(viewsets.ViewSet):
             raise exceptions.NotFound()
 
         task.partial = False
-        task.images_count = len(task.scan_images())
+        task.images_count = task.count_images()
 
         if task.images_count < 1:
             raise exceptions.ValidationError(detail=_("You need to upload at least 1 file before commit"))
@@ -209,11 +222,15 @@ class TaskViewSet(viewsets.ViewSet):
             raise exceptions.ValidationError(detail=_("No files uploaded"))
 
         uploaded = task.handle_images_upload(files)
-        task.images_count = len(task.scan_images())
+
         # Update other parameters such as processing node, task name, etc.
         serializer = TaskSerializer(task, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+
+        # Uploads run in parallel, update the images count separately from the
+        # full row save above, so that a concurrent upload cannot overwrite it with a stale value
+        models.Task.objects.filter(pk=task.id).update(images_count=task.count_images())
         
         return Response({'success': True, 'uploaded': uploaded}, status=status.HTTP_200_OK)
 
@@ -255,15 +272,16 @@ class TaskViewSet(viewsets.ViewSet):
                 task = models.Task.objects.create(project=project,
                                                   pending_action=pending_actions.RESIZE if 'resize_to' in request.data else None)
 
-                task.handle_images_upload(files)
-                task.images_count = len(task.scan_images())
+                # The task directory is new, so every uploaded name is a new image
+                task.images_count = len(task.handle_images_upload(files))
 
                 # Update other parameters such as processing node, task name, etc.
                 serializer = TaskSerializer(task, data=request.data, partial=True)
                 serializer.is_valid(raise_exception=True)
                 serializer.save()
 
-                worker_tasks.process_task.delay(task.id)
+                # Don't let the worker pick up the task before it's committed
+                transaction.on_commit(lambda: worker_tasks.process_task.delay(task.id))
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -297,7 +315,7 @@ class TaskViewSet(viewsets.ViewSet):
 
 
 class TaskNestedView(APIView):
-    queryset = models.Task.objects.all().defer('orthophoto_extent', 'dtm_extent', 'dsm_extent', )
+    queryset = models.Task.objects.select_related('processing_node', 'project').defer('orthophoto_extent', 'dtm_extent', 'dsm_extent', )
     permission_classes = (AllowAny, )
 
     def get_and_check_task(self, request, pk, annotate={}):
@@ -313,6 +331,11 @@ class TaskNestedView(APIView):
         return task
 
 
+@lru_cache(maxsize=256)
+def guess_content_type(filename):
+    return mimetypes.guess_type(filename)[0] or "application/zip"
+
+
 def download_file_response(request, filePath, content_disposition, download_filename=None):
     filename = os.path.basename(filePath)
     if download_filename is None: 
@@ -320,36 +343,21 @@ def download_file_response(request, filePath, content_disposition, download_file
     filesize = os.stat(filePath).st_size
     file = open(filePath, "rb")
 
-    # More than 100mb, normal http response, otherwise stream
-    # Django docs say to avoid streaming when possible
-    stream = filesize > 1e8 or request.GET.get('_force_stream', False)
-    if stream:
-        response = FileResponse(file)
-    else:
-        response = HttpResponse(FileWrapper(file),
-                                content_type=(mimetypes.guess_type(filename)[0] or "application/zip"))
+    # Always stream, so that the WSGI server can use its file wrapper
+    # (sendfile) instead of buffering the whole file in memory
+    response = FileResponse(file, content_type=guess_content_type(filename))
 
-    response['Content-Type'] = mimetypes.guess_type(filename)[0] or "application/zip"
     response['Content-Disposition'] = "{}; filename={}".format(content_disposition, download_filename)
     response['Content-Length'] = filesize
 
-    # For testing
-    if stream:
-        response['_stream'] = 'yes'
-
     return response
 
 
 def download_file_stream(request, stream, content_disposition, download_filename=None):
-    response = HttpResponse(FileWrapper(stream),
-                            content_type=(mimetypes.guess_type(download_filename)[0] or "application/zip"))
+    response = StreamingHttpResponse(stream, content_type=guess_content_type(download_filename))
 
-    response['Content-Type'] = mimetypes.guess_type(download_filename)[0] or "application/zip"
     response['Content-Disposition'] = "{}; filename={}".format(content_disposition, download_filename)
 
-    # For testing
-    response['_stream'] = 'yes'
-    
     return response
 
 
@@ -429,28 +437,33 @@ class TaskAssetsImport(APIView):
         # Chunked upload?
         tmp_upload_file = None
         if len(files) > 0 and chunk_index is not None and uuid is not None and total_chunk_count is not None:
-            byte_offset = request.data.get('dzchunkbyteoffset', 0) 
+            byte_offset = request.data.get('dzchunkbyteoffset', None)
 
             try:
                 chunk_index = int(chunk_index)
-                byte_offset = int(byte_offset)
+                if byte_offset is not None:
+                    byte_offset = int(byte_offset)
                 total_chunk_count = int(total_chunk_count)
             except ValueError:
                 raise exceptions.ValidationError(detail="Some parameters are not integers")
-            uuid = re.sub('[^0-9a-zA-Z-]+', "", uuid)
+            uuid = unsafe_uuid_chars.sub("", uuid)
 
             tmp_upload_file = os.path.join(settings.FILE_UPLOAD_TEMP_DIR, f"{uuid}.upload")
-            if os.path.isfile(tmp_upload_file) and chunk_index == 0:
-                os.unlink(tmp_upload_file)
-            
-            with open(tmp_upload_file, 'ab') as fd:
+
+            # Don't open in append mode, so that chunks are written at their byte offset
+            # (sendfile also refuses to write to O_APPEND descriptors)
+            if chunk_index == 0 or not os.path.isfile(tmp_upload_file):
+                mode = 'wb'
+            else:
+                mode = 'r+b'
+
+            # No offset, append to what we've received so far
+            if byte_offset is None:
+                byte_offset = 0 if mode == 'wb' else os.path.getsize(tmp_upload_file)
+
+            with open(tmp_upload_file, mode) as fd:
                 fd.seek(byte_offset)
-                if isinstance(files[0], InMemoryUploadedFile):
-                    for chunk in files[0].chunks():
-                        fd.write(chunk)
-                else:
-                    with open(files[0].temporary_file_path(), 'rb') as file:
-                        fd.write(file.read())
+                copy_uploaded_file(files[0], fd)
             
             if chunk_index + 1 < total_chunk_count:
                 return Response({'uploaded': True}, status=status.HTTP_200_OK)
@@ -469,17 +482,13 @@ class TaskAssetsImport(APIView):
             # Non-chunked file import
             if tmp_upload_file is None and len(files) > 0:
                 with open(destination_file, 'wb+') as fd:
-                    if isinstance(files[0], InMemoryUploadedFile):
-                        for chunk in files[0].chunks():
-                            fd.write(chunk)
-                    else:
-                        with open(files[0].temporary_file_path(), 'rb') as file:
-                            copyfileobj(file, fd)
+                    copy_uploaded_file(files[0], fd)
             elif tmp_upload_file is not None:
                 # Move
                 shutil.move(tmp_upload_file, destination_file)
 
-            worker_tasks.process_task.delay(task.id)
+            # Don't let the worker pick up the task before it's committed
+            transaction.on_commit(lambda: worker_tasks.process_task.delay(task.id))
 
         serializer = TaskSerializer(task)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -1,5 +1,6 @@
 import os
 import logging
+from itertools import islice
 logger = logging.getLogger('app.logger')
 
 class Console:
@@ -29,6 +30,21 @@ class Console:
     def output(self):
         return str(self)
 
+    def output_from_line(self, line_num):
+        """
+        Read the output starting from a certain line number,
+        without loading the lines that come before it
+        """
+        if not os.path.isfile(self.file):
+            return ""
+
+        try:
+            with open(self.file, 'r', encoding="utf-8") as f:
+                return ''.join(islice(f, line_num, None)).rstrip()
+        except IOError:
+            logger.warn("Cannot read console file: %s" % self.file)
+            return ""
+
     def append(self, text):
         if os.path.isdir(self.parent_dir):
             try:
@@ -22,7 +22,6 @@ from django.contrib.gis.gdal import GDALRaster
 from django.contrib.gis.gdal import OGRGeometry
 from django.contrib.gis.geos import GEOSGeometry
 from django.contrib.postgres import fields
-from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.core.exceptions import ValidationError, SuspiciousFileOperation
 from django.db import models
 from django.db import transaction
@@ -37,6 +36,7 @@ from app.cogeo import assure_cogeo
 from app.pointcloud_utils import is_pointcloud_georeferenced
 from app.testwatch import testWatch
 from app.security import path_traversal_check
+from app.uploadhandler import copy_uploaded_file
 from nodeodm import status_codes
 from nodeodm.models import ProcessingNode
 from pyodm.exceptions import NodeResponseError, NodeConnectionError, NodeServerError, OdmError
@@ -1158,6 +1158,17 @@ class Task(models.Model):
         except:
             return []
 
+    def count_images(self):
+        """
+        Same as len(self.scan_images()), without building the list of names
+        """
+        tp = self.task_path()
+        try:
+            with os.scandir(tp) as entries:
+                return sum(1 for e in entries if e.is_file())
+        except:
+            return 0
+
     def get_image_path(self, filename):
         p = self.task_path(filename)
         return path_traversal_check(p, self.task_path())
@@ -1176,12 +1187,7 @@ class Task(models.Model):
             dst_path = self.get_image_path(name)
 
             with open(dst_path, 'wb+') as fd:
-                if isinstance(file, InMemoryUploadedFile):
-                    for chunk in file.chunks():
-                        fd.write(chunk)
-                else:
-                    with open(file.temporary_file_path(), 'rb') as f:
-                        shutil.copyfileobj(f, fd)
+                copy_uploaded_file(file, fd)
             
             uploaded[name] = os.path.getsize(dst_path)
         return uploaded
@@ -125,6 +125,26 @@ class TestApi(BootTestCase):
         res = client.get('/api/projects/999/tasks/')
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
 
+        # Tasks on the same processing node list the same rerun-from values
+        rerun_from_domain = ['dataset', 'opensfm', 'odm_meshing']
+        rerun_pnode = ProcessingNode.objects.create(hostname="invalid-host", port=11223,
+                                                    available_options=[{'name': 'rerun-from', 'domain': rerun_from_domain}])
+        rerun_task = Task.objects.create(project=project, processing_node=rerun_pnode)
+        rerun_task2 = Task.objects.create(project=project, processing_node=rerun_pnode)
+
+        res = client.get('/api/projects/{}/tasks/'.format(project.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        can_rerun_from = {t['id']: t['can_rerun_from'] for t in res.data}
+        self.assertEqual(can_rerun_from[str(rerun_task.id)], rerun_from_domain)
+        self.assertEqual(can_rerun_from[str(rerun_task2.id)], rerun_from_domain)
+
+        # Tasks without a processing node have no rerun-from values
+        self.assertEqual(can_rerun_from[str(task.id)], [])
+
+        rerun_task.delete()
+        rerun_task2.delete()
+        rerun_pnode.delete()
+
         # Can list task details for a task belonging to a project we have access to
         res = client.get('/api/projects/{}/tasks/{}/'.format(project.id, task.id))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -162,6 +182,11 @@ class TestApi(BootTestCase):
         res = client.get('/api/projects/{}/tasks/{}/output/?line=-1'.format(project.id, task.id))
         self.assertEqual(res.data, task.console.output())
 
+        # Trailing newlines are stripped
+        task.console.append("\n\n")
+        self.assertEqual(task.console.output_from_line(1), "line2\nline3")
+        self.assertEqual(task.console.output_from_line(4), "")
+
         # Cannot list task details for a task belonging to a project we don't have access to
         res = client.get('/api/projects/{}/tasks/{}/'.format(other_project.id, other_task.id))
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
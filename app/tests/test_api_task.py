@@ -3,6 +3,7 @@ import os
 import time
 
 import threading
+from unittest import mock
 
 from worker.celery import app as celery
 import logging
@@ -367,10 +368,11 @@ class TestApiTask(BootTransactionTestCase):
                 res = client.get("/api/projects/{}/tasks/{}/download/{}".format(project.id, task.id, asset))
                 self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-            # We can stream downloads
-            res = client.get("/api/projects/{}/tasks/{}/download/{}?_force_stream=1".format(project.id, task.id, list(task.ASSETS_MAP.keys())[0]))
+            # Downloads are streamed
+            res = client.get("/api/projects/{}/tasks/{}/download/orthophoto.tif".format(project.id, task.id))
             self.assertTrue(res.status_code == status.HTTP_200_OK)
-            self.assertTrue(res.has_header('_stream'))
+            self.assertTrue(res.streaming)
+            self.assertEqual(int(res['Content-Length']), os.path.getsize(task.assets_path(task.ASSETS_MAP["orthophoto.tif"])))
 
             # The tif files are valid Cloud Optimized GeoTIFF
             self.assertTrue(valid_cogeo(task.assets_path(task.ASSETS_MAP["orthophoto.tif"])))
@@ -438,7 +440,7 @@ class TestApiTask(BootTransactionTestCase):
             # Can download images
             res = client.get("/api/projects/{}/tasks/{}/images/download/tiny_drone_image.jpg".format(project.id, task.id))
             self.assertTrue(res.status_code == status.HTTP_200_OK)
-            with Image.open(io.BytesIO(res.content)) as i:
+            with Image.open(io.BytesIO(b''.join(res.streaming_content))) as i:
                 # Thumbnail has been resized
                 self.assertEqual(i.width, 48)
                 self.assertEqual(i.height, 36)
@@ -1084,6 +1086,30 @@ class TestApiTask(BootTransactionTestCase):
         task.refresh_from_db()
         self.assertTrue(task.processing_node is None)
 
+    def test_task_pending_action_queues(self):
+        client = APIClient()
+        client.login(username="testuser", password="test1234")
+
+        user = User.objects.get(username="testuser")
+        project = Project.objects.create(name="User Test Project", owner=user)
+        task = Task.objects.create(project=project, name="Test")
+
+        # Cancel and remove are sent to the control queue, restart to the default queue
+        for action, queue in [('cancel', settings.WORKER_CONTROL_QUEUE),
+                              ('restart', None),
+                              ('remove', settings.WORKER_CONTROL_QUEUE)]:
+            with mock.patch.object(worker.tasks.process_task, 'apply_async') as apply_async, \
+                 mock.patch.object(worker.tasks.process_task, 'delay') as delay:
+                res = client.post("/api/projects/{}/tasks/{}/{}/".format(project.id, task.id, action))
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+                if queue is not None:
+                    apply_async.assert_called_once_with((task.id, ), queue=queue)
+                    delay.assert_not_called()
+                else:
+                    delay.assert_called_once_with(task.id)
+                    apply_async.assert_not_called()
+
     def test_task_chunked_uploads(self):
         with start_processing_node():
             client = APIClient()
@@ -1152,6 +1178,10 @@ class TestApiTask(BootTransactionTestCase):
             self.assertEqual(res.data['success'], True)
             image2.seek(0)
 
+            # Image count is updated while uploading
+            task.refresh_from_db()
+            self.assertEqual(task.images_count, 2)
+
             # Task hasn't started
             self.assertEqual(task.upload_progress, 0.0)
 
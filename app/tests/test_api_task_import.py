@@ -74,7 +74,7 @@ class TestApiTask(BootTransactionTestCase):
             assets_path = os.path.join(settings.MEDIA_TMP, "all.zip")
 
             with open(assets_path, 'wb') as f:
-                f.write(res.content)
+                f.write(b''.join(res.streaming_content))
 
             remove_perm('change_project', user, project)
 
@@ -217,3 +217,40 @@ class TestApiTask(BootTransactionTestCase):
             self.assertEqual(file_import_task.import_url, "file://all.zip")
             self.assertEqual(file_import_task.images_count, 1)
 
+
+            # Chunks without a byte offset are appended
+            chunk_1 = open(chunk_1_path, 'rb')
+            chunk_2 = open(chunk_2_path, 'rb')
+
+            res = client.post("/api/projects/{}/tasks/import".format(project.id), {
+                'file': [chunk_1],
+                'dzuuid': 'abc-test-no-offset',
+                'dzchunkindex': 0,
+                'dztotalchunkcount': 2,
+                'dzchunkbyteoffset': 0
+            }, format="multipart")
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            chunk_1.close()
+
+            res = client.post("/api/projects/{}/tasks/import".format(project.id), {
+                'file': [chunk_2],
+                'dzuuid': 'abc-test-no-offset',
+                'dzchunkindex': 1,
+                'dztotalchunkcount': 2
+            }, format="multipart")
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            chunk_2.close()
+
+            no_offset_task = Task.objects.get(id=res.data['id'])
+            c = 0
+            while c < 10:
+                worker.tasks.process_pending_tasks()
+                no_offset_task.refresh_from_db()
+                if no_offset_task.status == status_codes.COMPLETED:
+                    break
+                c += 1
+                time.sleep(1)
+
+            # The archive is not corrupted
+            self.assertEqual(no_offset_task.status, status_codes.COMPLETED)
+            self.assertEqual(no_offset_task.images_count, 1)
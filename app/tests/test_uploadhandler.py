@@ -0,0 +1,47 @@
+import os
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from app.uploadhandler import ClosedTemporaryUploadedFile, copy_uploaded_file
+from webodm import settings
+
+
+class TestUploadHandler(TestCase):
+    def test_copy_uploaded_file(self):
+        os.makedirs(settings.FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+        dst_path = os.path.join(settings.FILE_UPLOAD_TEMP_DIR, "test_copy_uploaded_file.upload")
+
+        # Uploads streamed to disk are copied with sendfile when available
+        tmp_file = ClosedTemporaryUploadedFile("chunk2", "application/octet-stream", 0, None)
+        tmp_file.write(b"world")
+        tmp_file.seek(0)
+        tmp_file.size = 5
+        tmp_file.close()
+
+        # Chunks land at their byte offset
+        with open(dst_path, 'wb') as fd:
+            fd.write(b"hello")
+        with open(dst_path, 'r+b') as fd:
+            fd.seek(5)
+            if hasattr(os, 'sendfile'):
+                with mock.patch('os.sendfile', wraps=os.sendfile) as sendfile:
+                    copy_uploaded_file(tmp_file, fd)
+                    self.assertTrue(sendfile.called)
+            else:
+                copy_uploaded_file(tmp_file, fd)
+
+        with open(dst_path, 'rb') as fd:
+            self.assertEqual(fd.read(), b"helloworld")
+
+        # In memory uploads are copied too
+        with open(dst_path, 'r+b') as fd:
+            fd.seek(10)
+            copy_uploaded_file(SimpleUploadedFile("chunk3", b"!"), fd)
+
+        with open(dst_path, 'rb') as fd:
+            self.assertEqual(fd.read(), b"helloworld!")
+
+        os.unlink(dst_path)
+        os.unlink(tmp_file.temporary_file_path())
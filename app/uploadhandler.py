@@ -1,7 +1,9 @@
+import os
+import shutil
 import tempfile
 
 import errno
-from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadedfile import UploadedFile, InMemoryUploadedFile
 from django.core.files.uploadhandler import FileUploadHandler
 
 from django.conf import settings
@@ -58,3 +60,47 @@ class ClosedTemporaryUploadedFile(UploadedFile):
                 # could unlink it.  Still sets self.file.close_called and
                 # calls self.file.file.close() before the exception
                 raise
+
+
+# Buffer size used when sendfile(2) is not available
+COPY_BUFFER_SIZE = 8 * 1024 * 1024 # 8 MB
+
+
+def copy_uploaded_file(uploaded_file, dst_fd):
+    """
+    Write the contents of an uploaded file to an open (binary) file object.
+    Files that were streamed to disk are copied in kernel space with sendfile(2)
+    when available, otherwise with a large buffer.
+    """
+    if isinstance(uploaded_file, InMemoryUploadedFile):
+        uploaded_file.file.seek(0)
+        shutil.copyfileobj(uploaded_file.file, dst_fd, COPY_BUFFER_SIZE)
+    else:
+        with open(uploaded_file.temporary_file_path(), 'rb') as src_fd:
+            copy_file(src_fd, dst_fd)
+
+
+def copy_file(src_fd, dst_fd):
+    """
+    Copy the contents of src_fd into dst_fd (both open binary file objects)
+    """
+    if hasattr(os, 'sendfile'):
+        dst_fd.flush()
+        in_fd = src_fd.fileno()
+        out_fd = dst_fd.fileno()
+        size = os.fstat(in_fd).st_size
+        offset = 0
+        try:
+            while offset < size:
+                sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+            return
+        except OSError:
+            # Some platforms do not support file to file sendfile,
+            # in which case nothing has been written yet and we can fallback
+            if offset > 0:
+                raise
+
+    shutil.copyfileobj(src_fd, dst_fd, COPY_BUFFER_SIZE)
@@ -33,12 +33,12 @@ def index(request):
 
 @login_required
 def dashboard(request):
-    no_processingnodes = ProcessingNode.objects.count() == 0
+    no_processingnodes = not ProcessingNode.objects.exists()
     if no_processingnodes and settings.PROCESSING_NODES_ONBOARDING is not None:
         return redirect(settings.PROCESSING_NODES_ONBOARDING)
 
-    no_tasks = Task.objects.filter(project__owner=request.user).count() == 0
-    no_projects = Project.objects.filter(owner=request.user).count() == 0
+    no_tasks = not Task.objects.filter(project__owner=request.user).exists()
+    no_projects = not Project.objects.filter(owner=request.user).exists()
 
     # Create first project automatically
     if no_projects and request.user.has_perm('app.add_project'):
@@ -343,6 +343,14 @@ CELERY_INCLUDE=['worker.tasks', 'app.plugins.worker']
 CELERY_WORKER_REDIRECT_STDOUTS = False
 CELERY_WORKER_HIJACK_ROOT_LOGGER = False
 
+# Task processing can take a long time, don't let
+# workers reserve messages they cannot start
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Queue for task actions that should not wait behind
+# long running task processing (cancel, remove)
+WORKER_CONTROL_QUEUE = 'control'
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
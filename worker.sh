@@ -52,7 +52,31 @@ start(){
 	action=$1
 
 	echo "Starting worker using broker at $WO_BROKER"
-	celery -A worker worker --autoscale $(grep -c '^processor' /proc/cpuinfo),2 --max-tasks-per-child 1000 --loglevel=warn > /dev/null
+
+	# Forward stop signals to the workers (warm shutdown). Set before forking,
+	# so that a signal received while starting up doesn't leave orphaned workers
+	stopping=""
+	trap 'stopping=1; kill -TERM $worker_pid $control_pid 2>/dev/null' INT TERM
+
+	# Dedicated worker for cancel/remove actions, so they don't wait behind long running tasks
+	celery -A worker worker -Q control -n control@%h --concurrency 2 --max-tasks-per-child 1000 --loglevel=warn > /dev/null &
+	control_pid=$!
+	if [[ -z "$stopping" ]]; then
+		celery -A worker worker -Q celery,control -Ofair --autoscale $(grep -c '^processor' /proc/cpuinfo),2 --max-tasks-per-child 1000 --loglevel=warn > /dev/null &
+		worker_pid=$!
+	fi
+
+	# Stop both workers when either one exits (wait -n requires bash 4.3+,
+	# older versions only watch the main worker)
+	if [[ -z "$stopping" ]]; then
+		if (( BASH_VERSINFO[0] > 4 || (BASH_VERSINFO[0] == 4 && BASH_VERSINFO[1] >= 3) )); then
+			wait -n
+		else
+			wait $worker_pid
+		fi
+	fi
+	kill -TERM $worker_pid $control_pid 2>/dev/null
+	wait
 }
 
 start_scheduler(){